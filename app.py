@@ -1,35 +1,97 @@
-from flask import Flask, render_template, request, jsonify, send_file, abort
+from flask import Flask, Request, render_template, request, jsonify, send_file, abort, Response, stream_with_context
 import os
+import asyncio
+import atexit
+import bisect
+import io
 import json
 import re
-import random
+import secrets
 import logging
+import logging.handlers
+import multiprocessing
+import hashlib
+import queue
+import threading
+import zipfile
+import time
+import functools
+import itertools
+from collections import OrderedDict
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, ThreadPoolExecutor
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import HTTPException
+from flask.json.provider import DefaultJSONProvider
 from dotenv import load_dotenv
 import google.generativeai as genai
-from docx import Document
-import PyPDF2
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, HRFlowable, KeepTogether
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_LEFT, TA_CENTER
-from reportlab.lib.units import mm, cm
+from google.api_core import exceptions as google_exceptions
+from typing_extensions import TypedDict
+
+try:
+    import redis
+except ImportError:  # Optional: only needed when REDIS_URL is configured
+    redis = None
+try:
+    import orjson
+except ImportError:  # Optional: faster JSON encode/decode, stdlib json otherwise
+    orjson = None
 
 load_dotenv()
 
 # Configure logging for security events (logs errors server-side, not to users)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('app.log'),
-        logging.StreamHandler()
-    ]
-)
+# Records are written by a background thread, so request threads never wait on app.log or stderr
+log_handlers = [
+    logging.FileHandler('app.log'),
+    logging.StreamHandler()
+]
+for handler in log_handlers:
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+log_queue = queue.Queue()
+log_queue_handler = logging.handlers.QueueHandler(log_queue)
+log_listener = logging.handlers.QueueListener(log_queue, *log_handlers, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
+# No formatter on the queue handler: it only merges args and tracebacks into the message
+logging.getLogger().addHandler(log_queue_handler)
+logging.getLogger().setLevel(logging.INFO)
 logger = logging.getLogger(__name__)
 
+def log_directly_after_fork():
+    # The listener thread does not survive a fork, so forked pool workers write to the handlers themselves
+    root = logging.getLogger()
+    root.removeHandler(log_queue_handler)
+    for handler in log_handlers:
+        root.addHandler(handler)
+
+os.register_at_fork(after_in_child=log_directly_after_fork)
+
+class InMemoryUploadRequest(Request):
+    """Keep uploaded files in memory instead of spooling anything over 500KB to a temp file"""
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # MAX_CONTENT_LENGTH already bounds how big this buffer can get
+        return io.BytesIO()
+
+def json_loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def json_dumps(value):
+    return orjson.dumps(value).decode() if orjson is not None else json.dumps(value)
+
+class OrjsonProvider(DefaultJSONProvider):
+    """jsonify and request.get_json through orjson"""
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 app = Flask(__name__)
+app.request_class = InMemoryUploadRequest
+if orjson is not None:
+    app.json = OrjsonProvider(app)
 
 # Security: Use strong secret key from environment, fail if not set in production
 secret_key = os.getenv('SECRET_KEY')
@@ -39,18 +101,166 @@ if not secret_key:
     secret_key = os.urandom(24)
 app.secret_key = secret_key
 
-app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['GENERATED_FOLDER'] = 'generated'
+
+# Internal nginx location aliased to GENERATED_FOLDER (e.g. /_protected_generated/); unset means Flask sends files
+DOWNLOAD_ACCEL_PREFIX = os.getenv('DOWNLOAD_ACCEL_PREFIX', '')
+# Generated PDFs are named per job and never rewritten, so browsers can keep them.
+# Security: private, so shared caches and CDNs never store someone's CV
+DOWNLOAD_CACHE_CONTROL = 'private, max-age=86400, immutable'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# The upload form has one file and a handful of text fields; capping parts and
+# in-memory field size stops the multipart parser early on abusive bodies
+app.config['MAX_FORM_PARTS'] = 20
+app.config['MAX_FORM_MEMORY_SIZE'] = 512 * 1024
 
 # Security: Restrict allowed file extensions
 ALLOWED_EXTENSIONS = {'pdf', 'docx'}
 
+# Security: Leading bytes each allowed type must start with (DOCX is a zip archive)
+FILE_SIGNATURES = {'pdf': b'%PDF', 'docx': b'PK\x03\x04'}
+
 # Security: Allowed characters in filenames (alphanumeric, underscore, hyphen, period)
 SAFE_FILENAME_PATTERN = re.compile(r'^[a-zA-Z0-9_\-\.]+$')
+# Security: Anything else in an upload's base name is replaced before it names a generated PDF
+UNSAFE_BASENAME_CHARS = re.compile(r'[^a-zA-Z0-9_\-]')
+
+class LRUCache:
+    """Small thread-safe LRU mapping used for per-process result caches, with optional expiry"""
+
+    def __init__(self, maxsize=256, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+# Generated CVs expire after a day in the in-process, Redis and disk tiers
+CV_CACHE_TTL_SECONDS = 24 * 60 * 60
+# Gemini output keyed by the content of the CV and job description
+CV_JSON_CACHE = LRUCache(maxsize=512, ttl=CV_CACHE_TTL_SECONDS)
+# Extracted CV text keyed by the SHA-256 of the uploaded file bytes
+TEXT_CACHE = LRUCache(maxsize=256)
+# Freshly built PDFs by filename; the results page downloads them moments after the job ends
+PDF_CACHE = LRUCache(maxsize=64, ttl=15 * 60)
+
+def sha256_hex(value):
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return hashlib.sha256(value).hexdigest()
+
+def blake2b_hex(value):
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return hashlib.blake2b(value, digest_size=16).hexdigest()
+
+# Shared cache for generated CVs across gunicorn workers and restarts (optional)
+redis_client = None
+if os.getenv('REDIS_URL'):
+    if redis is None:
+        logger.warning("REDIS_URL is set but the redis package is not installed; using the in-process cache only")
+    else:
+        redis_client = redis.Redis(connection_pool=redis.ConnectionPool.from_url(os.getenv('REDIS_URL')))
+
+def redis_get_json(key):
+    if redis_client is None:
+        return None
+    try:
+        cached = redis_client.get(key)
+        return json_loads(cached) if cached else None
+    except Exception as e:
+        logger.warning("Redis read failed: %s", e)
+        return None
+
+def redis_set_json(key, value, ttl=CV_CACHE_TTL_SECONDS):
+    if redis_client is None:
+        return
+    try:
+        redis_client.setex(key, ttl, json_dumps(value))
+    except Exception as e:
+        logger.warning("Redis write failed: %s", e)
 
 os.makedirs(app.config['GENERATED_FOLDER'], exist_ok=True)
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+# Without Redis, generated CVs and analysis job states are kept on disk instead, so every worker on
+# the host and a restarted one can see them. Security: the leading dots keep these folders out of /download's reach
+CV_DISK_CACHE_DIR = os.path.join(app.config['GENERATED_FOLDER'], '.cv_cache')
+JOB_DISK_DIR = os.path.join(app.config['GENERATED_FOLDER'], '.jobs')
+DISK_CACHE_PRUNE_SECONDS = 60 * 60
+_disk_pruned_at = {}
+if redis_client is None:
+    os.makedirs(CV_DISK_CACHE_DIR, exist_ok=True)
+    os.makedirs(JOB_DISK_DIR, exist_ok=True)
+
+def cv_disk_cache_path(key):
+    return os.path.join(CV_DISK_CACHE_DIR, f"{blake2b_hex(key)}.json")
+
+def disk_get_json(path, ttl):
+    try:
+        if time.time() - os.stat(path).st_mtime > ttl:
+            return None
+        with open(path, 'rb') as f:
+            return json_loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+def disk_set_json(path, value, ttl):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            f.write(json_dumps(value))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("Could not write %s: %s", path, e)
+    prune_disk_dir(os.path.dirname(path), ttl)
+
+def prune_disk_dir(directory, ttl):
+    """Delete entries older than ttl, at most once per DISK_CACHE_PRUNE_SECONDS per folder and worker"""
+    now = time.time()
+    if now - _disk_pruned_at.get(directory, 0) < DISK_CACHE_PRUNE_SECONDS:
+        return
+    _disk_pruned_at[directory] = now
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if now - entry.stat().st_mtime > ttl:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+    except OSError as e:
+        logger.warning("Could not prune %s: %s", directory, e)
+
+def shared_get_json(key):
+    """Look a generated CV up in Redis when it is configured, otherwise on disk"""
+    if redis_client is not None:
+        return redis_get_json(key)
+    return disk_get_json(cv_disk_cache_path(key), CV_CACHE_TTL_SECONDS)
+
+def shared_set_json(key, value):
+    if redis_client is not None:
+        redis_set_json(key, value)
+    else:
+        disk_set_json(cv_disk_cache_path(key), value, CV_CACHE_TTL_SECONDS)
 
 genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
 
@@ -101,6 +311,7 @@ COLOR_SCHEMES = [
         'sidebar_text': '#FFFFFF'
     }
 ]
+COLOR_SCHEMES_BY_NAME = {scheme['name']: scheme for scheme in COLOR_SCHEMES}
 
 CADENCE_PRESETS = {
     'low': {
@@ -124,52 +335,153 @@ def normalize_cadence(raw_value):
     value = (raw_value or 'medium').strip().lower()
     return value if value in CADENCE_PRESETS else 'medium'
 
+# A full CV JSON is typically 1-1.5k tokens; the cap bounds decode time on runaway outputs
+MAX_OUTPUT_TOKENS = 2048
+
+# Response schema for the generated CV; Gemini then always returns bare, valid JSON.
+# Fields are optional so missing CV sections can still be left blank.
+class CVLink(TypedDict):
+    label: str
+    url: str
+
+class CVProject(TypedDict):
+    title: str
+    tech: str
+    bullets: list[str]
+
+class CVExperience(TypedDict):
+    role: str
+    company: str
+    dates: str
+    bullets: list[str]
+
+class CVEducation(TypedDict):
+    degree: str
+    institution: str
+    dates: str
+    grade: str
+    modules: list[str]
+
+class CVOutput(TypedDict):
+    full_name: str
+    email: str
+    location: str
+    links: list[CVLink]
+    summary: str
+    achievements: list[str]
+    projects: list[CVProject]
+    experience: list[CVExperience]
+    education: list[CVEducation]
+    skills: list[str]
+
+# Only one config per cadence exists; the SDK copies the config per call, so one instance is shared
+@functools.lru_cache(maxsize=None)
 def get_generation_config(cadence):
     preset = CADENCE_PRESETS[cadence]
     return genai.GenerationConfig(
         temperature=preset['temperature'],
         top_p=preset['top_p'],
         top_k=50,
-        response_mime_type="application/json"
+        max_output_tokens=MAX_OUTPUT_TOKENS,
+        response_mime_type="application/json",
+        response_schema=CVOutput
     )
 
+# list_models() is a network round trip on every worker start, so its result is kept on disk for a day
+MODEL_LIST_CACHE_PATH = os.path.join(app.config['GENERATED_FOLDER'], '.models.json')
+MODEL_LIST_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+def load_cached_model_list(max_age=MODEL_LIST_CACHE_TTL_SECONDS):
+    """The cached list for this API key, or None; max_age=None accepts a stale list"""
+    try:
+        with open(MODEL_LIST_CACHE_PATH) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # A different API key may see a different set of models
+    if cached.get('key') != blake2b_hex(os.getenv('GEMINI_API_KEY') or ''):
+        return None
+    if max_age is not None and time.time() - cached.get('saved_at', 0) > max_age:
+        return None
+    return cached.get('models') or None
+
+def save_cached_model_list(models):
+    payload = {'key': blake2b_hex(os.getenv('GEMINI_API_KEY') or ''), 'saved_at': time.time(), 'models': models}
+    tmp_path = f"{MODEL_LIST_CACHE_PATH}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, MODEL_LIST_CACHE_PATH)
+    except OSError as e:
+        logger.warning("Could not save model list cache: %s", e)
+
 def get_prioritized_model_list():
+    cached = load_cached_model_list()
+    if cached:
+        logger.info("Using cached model list (%s models)", len(cached))
+        return cached
+
     logger.info("Building model list...")
     
     try:
+        # Robotics models can't write a CV, so they are dropped here rather than per tier
         all_my_models = []
+        seen = set()
         for m in genai.list_models():
             if 'generateContent' in m.supported_generation_methods:
                 name = m.name.replace('models/', '')
-                all_my_models.append(name)
-        
-        prioritized = []
-        
-        p1 = [m for m in all_my_models if 'flash' in m and 'lite' in m]
-        p1.sort(key=lambda x: 'preview' in x) 
-        prioritized.extend(p1)
-
-        p2 = [m for m in all_my_models if 'gemini-2.5-flash' in m and m not in prioritized]
-        prioritized.extend(p2)
-
-        p3 = [m for m in all_my_models if 'gemini-2.0-flash' in m and m not in prioritized]
-        prioritized.extend(p3)
+                if 'robotics' not in name and name not in seen:
+                    seen.add(name)
+                    all_my_models.append(name)
         
+        # One pass: flash-lite first (previews last), then 2.5 flash, 2.0 flash, then the rest
+        lite, flash_25, flash_20, rest = [], [], [], []
         for m in all_my_models:
-            if m not in prioritized:
-                if 'robotics' not in m:
-                    prioritized.append(m)
+            if 'flash' in m and 'lite' in m:
+                lite.append(m)
+            elif 'gemini-2.5-flash' in m:
+                flash_25.append(m)
+            elif 'gemini-2.0-flash' in m:
+                flash_20.append(m)
+            else:
+                rest.append(m)
+        lite.sort(key=lambda x: 'preview' in x)
+        prioritized = lite + flash_25 + flash_20 + rest
                 
-        logger.info(f"Found {len(prioritized)} valid models.")
+        logger.info("Found %s valid models.", len(prioritized))
         if len(prioritized) > 0:
-            logger.info(f"Top Pick (Priority 1): {prioritized[0]}")
+            logger.info("Top Pick (Priority 1): %s", prioritized[0])
+            save_cached_model_list(prioritized)
         return prioritized
 
     except Exception as e:
-        logger.error(f"Error listing models: {e}")
+        logger.error("Error listing models: %s", e)
+        # A day-old list from this key beats the hard-coded guess below
+        stale = load_cached_model_list(max_age=None)
+        if stale:
+            logger.info("Using stale cached model list (%s models)", len(stale))
+            return stale
         return ['gemini-2.0-flash-lite-001', 'gemini-2.5-flash', 'gemini-2.0-flash']
 
-VALID_MODELS = get_prioritized_model_list()
+# Built on first use so importing the app never waits on list_models()
+_valid_models = None
+_valid_models_lock = threading.Lock()
+
+def get_valid_models():
+    global _valid_models
+    with _valid_models_lock:
+        if _valid_models is None:
+            _valid_models = get_prioritized_model_list()
+        return _valid_models
+
+# GenerativeModel is a thin wrapper, so one is kept per model instead of built per attempt
+MODEL_CACHE = {}
+
+def get_model(model_name):
+    model = MODEL_CACHE.get(model_name)
+    if model is None:
+        model = MODEL_CACHE.setdefault(model_name, genai.GenerativeModel(model_name))
+    return model
 
 AI_PATTERNS = [
     (r'\bplayed a key role in\b', 'helped with'),
@@ -198,44 +510,97 @@ AI_PATTERNS = [
     (r'the planning and delivery of\b', 'running'),
     (r'\bacted as the primary\b', 'was the'),
 ]
+# All patterns fused into one alternation so each string is scanned once; the
+# named group that matched picks the replacement
+AI_PATTERN_RE = re.compile(
+    "|".join(f"(?P<p{i}>{pattern})" for i, (pattern, _) in enumerate(AI_PATTERNS)),
+    re.IGNORECASE
+)
+AI_REPLACEMENTS = {f"p{i}": replacement for i, (_, replacement) in enumerate(AI_PATTERNS)}
+WHITESPACE_RE = re.compile(r'\s+')
+SPACE_BEFORE_DOT_RE = re.compile(r'\s+\.')
+SPACE_BEFORE_COMMA_RE = re.compile(r'\s+,')
 
 def clean_ai_patterns(text):
     if not text or not isinstance(text, str):
         return text
-    result = text
-    for pattern, replacement in AI_PATTERNS:
-        result = re.sub(pattern, replacement, result, flags=re.IGNORECASE)
-    result = re.sub(r'\s+', ' ', result).strip()
-    result = re.sub(r'\s+\.', '.', result)
-    result = re.sub(r'\s+,', ',', result)
+    result = AI_PATTERN_RE.sub(lambda match: AI_REPLACEMENTS[match.lastgroup], text)
+    result = WHITESPACE_RE.sub(' ', result).strip()
+    result = SPACE_BEFORE_DOT_RE.sub('.', result)
+    result = SPACE_BEFORE_COMMA_RE.sub(',', result)
     return result
 
+# Joins every string in a CV for a single pass of each regex; no pattern matches it
+# and, unlike \x1e, it is not whitespace to WHITESPACE_RE
+CLEAN_SEPARATOR = '\x00'
+
+def clean_texts(texts):
+    joined = CLEAN_SEPARATOR.join(texts)
+    if joined.count(CLEAN_SEPARATOR) != len(texts) - 1:
+        # A string already contains the separator, so splitting back would misalign
+        return [clean_ai_patterns(text) for text in texts]
+    joined = AI_PATTERN_RE.sub(lambda match: AI_REPLACEMENTS[match.lastgroup], joined)
+    joined = WHITESPACE_RE.sub(' ', joined)
+    joined = SPACE_BEFORE_DOT_RE.sub('.', joined)
+    joined = SPACE_BEFORE_COMMA_RE.sub(',', joined)
+    return [part.strip() for part in joined.split(CLEAN_SEPARATOR)]
+
 def clean_cv_data(cv_data):
     if not cv_data:
         return cv_data
     
+    # (container, key) of every string to clean, written back after one clean_texts call
+    slots = []
     if cv_data.get('summary'):
-        cv_data['summary'] = clean_ai_patterns(cv_data['summary'])
+        slots.append((cv_data, 'summary'))
+    for entries in (cv_data.get('experience', []), cv_data.get('projects', [])):
+        for entry in entries:
+            slots.extend((entry['bullets'], i) for i in range(len(entry.get('bullets') or [])))
+    slots.extend((cv_data['achievements'], i) for i in range(len(cv_data.get('achievements') or [])))
     
-    for job in cv_data.get('experience', []):
-        if job.get('bullets'):
-            job['bullets'] = [clean_ai_patterns(b) for b in job['bullets']]
-    
-    for proj in cv_data.get('projects', []):
-        if proj.get('bullets'):
-            proj['bullets'] = [clean_ai_patterns(b) for b in proj['bullets']]
-    
-    if cv_data.get('achievements'):
-        cv_data['achievements'] = [clean_ai_patterns(a) for a in cv_data['achievements']]
+    slots = [(container, key) for container, key in slots if container[key] and isinstance(container[key], str)]
+    if slots:
+        for (container, key), text in zip(slots, clean_texts([container[key] for container, key in slots])):
+            container[key] = text
     
     return cv_data
 
+def file_extension(filename):
+    if not filename or '.' not in filename:
+        return ''
+    return filename.rsplit('.', 1)[1].lower()
+
 def allowed_file(filename):
     """Security: Validate file extension"""
-    if not filename or '.' not in filename:
-        return False
-    ext = filename.rsplit('.', 1)[1].lower()
-    return ext in ALLOWED_EXTENSIONS
+    return file_extension(filename) in ALLOWED_EXTENSIONS
+
+def upload_size(file):
+    stream = file.stream
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+def upload_sha256(file):
+    """Hash an upload without copying it out of its stream"""
+    stream = file.stream
+    if isinstance(stream, io.BytesIO):
+        # InMemoryUploadRequest already holds the whole file in this buffer
+        with stream.getbuffer() as view:
+            return hashlib.sha256(view).hexdigest()
+    digest = hashlib.sha256()
+    chunk = bytearray(64 * 1024)
+    view = memoryview(chunk)
+    while n := stream.readinto(chunk):
+        digest.update(view[:n])
+    stream.seek(0)
+    return digest.hexdigest()
+
+def matches_signature(file, ext):
+    """Security: Check the upload's magic bytes agree with its extension"""
+    head = file.stream.read(4)
+    file.stream.seek(0)
+    return head == FILE_SIGNATURES[ext]
 
 def is_safe_filename(filename):
     """Security: Check if filename contains only safe characters"""
@@ -247,6 +612,10 @@ def is_safe_filename(filename):
         return False
     return bool(SAFE_FILENAME_PATTERN.match(secured))
 
+@functools.lru_cache(maxsize=None)
+def absolute_dir(directory):
+    return os.path.abspath(directory)
+
 def validate_file_path(directory, filename):
     """
     Security: Prevent path traversal attacks
@@ -260,13 +629,13 @@ def validate_file_path(directory, filename):
     if not safe_filename:
         return None
     
-    # Construct the full path
-    base_path = os.path.abspath(directory)
-    full_path = os.path.abspath(os.path.join(base_path, safe_filename))
+    # Construct the full path; a secure_filename result has no separators or '..' left to normalize
+    base_path = absolute_dir(directory)
+    full_path = os.path.join(base_path, safe_filename)
     
     # Security: Ensure the resolved path is within the expected directory
     if not full_path.startswith(base_path + os.sep) and full_path != base_path:
-        logger.warning(f"Path traversal attempt detected: {filename}")
+        logger.warning("Path traversal attempt detected: %s", filename)
         return None
     
     # Check if file exists
@@ -275,44 +644,115 @@ def validate_file_path(directory, filename):
     
     return full_path
 
-def extract_cv_text(file_path):
+# reportlab's layout holds the GIL for the whole render, so PDFs are built on a process pool. Its
+# processes come from a forkserver rather than a fork of this multi-threaded worker and its gRPC channel
+PDF_POOL_WORKERS = min(8, os.cpu_count() or 1)
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+def get_pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_POOL_WORKERS, mp_context=multiprocessing.get_context('forkserver'))
+        return _pdf_pool
+
+# pymupdf, lxml and reportlab are imported inside the functions that use them,
+# so workers that never parse or render a CV don't pay their import time and memory
+
+# Enough text for the prompt (see MAX_CV_CHARS); later pages of long portfolios are never decoded
+PDF_TEXT_BUDGET = 20000
+# Image-heavy PDFs never reach the budget, so the page count is bounded too
+PDF_MAX_PAGES = 20
+# PyMuPDF is not thread-safe; extraction takes well under a millisecond per page, so uploads take turns
+_pymupdf_lock = threading.Lock()
+
+def extract_text_from_pdf(data):
+    import pymupdf
+    parts = []
+    total = 0
+    with _pymupdf_lock, pymupdf.open(stream=data, filetype="pdf") as doc:
+        for page in doc.pages(0, min(doc.page_count, PDF_MAX_PAGES)):
+            text = page.get_text("text") or ""
+            parts.append(text)
+            total += len(text)
+            if total >= PDF_TEXT_BUDGET:
+                break
+    return "\n".join(parts)
+
+# Plain-text extraction reads word/document.xml directly instead of building
+# python-docx's full document object model
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+DOCX_TEXT_TAGS = {WORD_NS + 't': None, WORD_NS + 'tab': '\t', WORD_NS + 'br': '\n', WORD_NS + 'cr': '\n'}
+
+def extract_text_from_docx(data):
+    from lxml import etree
+    # Security: never expand entities or fetch anything the uploaded XML points at
+    parser = etree.XMLParser(resolve_entities=False, no_network=True)
+    with zipfile.ZipFile(io.BytesIO(data)) as docx:
+        root = etree.fromstring(docx.read('word/document.xml'), parser)
+    paragraphs = []
+    for paragraph in root.iter(WORD_NS + 'p'):
+        # mc:Fallback repeats its mc:Choice sibling (e.g. a text box as VML) for older readers
+        if next(paragraph.iterancestors(MC_FALLBACK), None) is not None:
+            continue
+        parts = []
+        for node in paragraph.iter(*DOCX_TEXT_TAGS):
+            # Text boxes nest whole paragraphs; their text belongs to those, not this one
+            if next(node.iterancestors(WORD_NS + 'p', MC_FALLBACK)) is not paragraph:
+                continue
+            replacement = DOCX_TEXT_TAGS[node.tag]
+            parts.append((node.text or '') if replacement is None else replacement)
+        paragraphs.append("".join(parts))
+    return "\n".join(paragraphs)
+
+EXTRACTORS = {
+    'pdf': extract_text_from_pdf,
+    'docx': extract_text_from_docx,
+}
+
+def extract_cv_text(data, ext):
+    """Extract plain text from an uploaded CV held in memory (never written to disk)"""
     text = ""
     try:
-        if file_path.endswith('.pdf'):
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text() or ""
-        elif file_path.endswith('.docx'):
-            doc = Document(file_path)
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
+        digest = sha256_hex(data)
+        cached = TEXT_CACHE.get(digest)
+        if cached is not None:
+            return cached
+        text = EXTRACTORS[ext](data)
+        TEXT_CACHE.put(digest, text)
     except Exception as e:
-        logger.error(f"Error reading file: {e}")
+        logger.error("Error reading file: %s", e)
     return text
 
-def create_pdf(data, filename):
-    from reportlab.pdfbase.pdfmetrics import stringWidth
-    from reportlab.platypus import BaseDocTemplate, Frame, PageTemplate, Flowable
-
-    color_scheme = random.choice(COLOR_SCHEMES)
-    logger.info(f"Using color scheme: {color_scheme['name']}")
-    
-    filepath = os.path.join(app.config['GENERATED_FOLDER'], filename)
-    
-    page_width, page_height = A4
-    sidebar_width = 180 
-    main_width = page_width - sidebar_width
-    
-    def hex_to_alpha(hex_code, alpha=0.15):
-        hex_code = hex_code.lstrip('#')
-        return colors.Color(
-            int(hex_code[0:2], 16)/255.0,
-            int(hex_code[2:4], 16)/255.0,
-            int(hex_code[4:6], 16)/255.0,
-            alpha=alpha
-        )
+@functools.lru_cache(maxsize=None)
+def hex_to_alpha(hex_code, alpha=0.15):
+    from reportlab.lib import colors
+    hex_code = hex_code.lstrip('#')
+    return colors.Color(
+        int(hex_code[0:2], 16)/255.0,
+        int(hex_code[2:4], 16)/255.0,
+        int(hex_code[4:6], 16)/255.0,
+        alpha=alpha
+    )
 
+@functools.lru_cache(maxsize=1)
+def get_pdf_base_styles():
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.pdfbase import pdfmetrics
+    # Load the standard font metrics create_pdf uses along with the styles
+    for font_name in ('Helvetica', 'Helvetica-Bold'):
+        pdfmetrics.getFont(font_name)
+    return getSampleStyleSheet()
+
+def build_pdf_theme(color_scheme):
+    """Colors and paragraph styles for one scheme; styles are never mutated, so requests share them"""
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_LEFT, TA_CENTER
+    from reportlab.lib.styles import ParagraphStyle
+
+    styles = get_pdf_base_styles()
     sidebar_bg = colors.HexColor(color_scheme['sidebar_bg'])
     sidebar_text = colors.HexColor(color_scheme['sidebar_text'])
     text_dark = colors.HexColor(color_scheme['text_dark'])
@@ -320,33 +760,8 @@ def create_pdf(data, filename):
     text_light = colors.HexColor(color_scheme['text_light'])
     header_border = colors.HexColor(color_scheme['header_border'])
     
-    header_bg_transparent = hex_to_alpha(color_scheme['header_border'], alpha=0.25)
-    
-    doc = BaseDocTemplate(
-        filepath,
-        pagesize=A4,
-        rightMargin=0,
-        leftMargin=0,
-        topMargin=0,
-        bottomMargin=0
-    )
-
-    def draw_sidebar_bg(canvas, doc):
-        canvas.saveState()
-        canvas.setFillColor(sidebar_bg)
-        canvas.rect(0, 0, sidebar_width, page_height, stroke=0, fill=1)
-        canvas.restoreState()
-
-    full_frame = Frame(
-        0, 0, page_width, page_height,
-        leftPadding=0, bottomPadding=0, rightPadding=0, topPadding=0, 
-        id='normal'
-    )
-    
-    full_page_template = PageTemplate(id='full_page', frames=full_frame, onPage=draw_sidebar_bg)
-    doc.addPageTemplates([full_page_template])
-
-    styles = getSampleStyleSheet()
+    # Same tint the header band had when two nested tables each painted it at 0.25
+    header_bg_transparent = hex_to_alpha(color_scheme['header_border'], alpha=1 - 0.75 ** 2)
 
     name_style = ParagraphStyle('NameStyle', parent=styles['Normal'], fontSize=28, fontName="Helvetica-Bold", textColor=text_dark, alignment=TA_CENTER, spaceAfter=4, leading=34)
     job_subtitle_style = ParagraphStyle('JobSubtitle', parent=styles['Normal'], fontSize=11, textColor=text_medium, alignment=TA_CENTER, spaceAfter=0, leading=14)
@@ -377,73 +792,88 @@ def create_pdf(data, filename):
     edu_degree = ParagraphStyle('EduDegree', parent=styles['Normal'], fontSize=10, fontName="Helvetica-Bold", textColor=sidebar_text, spaceBefore=4, spaceAfter=1, leftIndent=8)
     edu_detail = ParagraphStyle('EduDetail', parent=styles['Normal'], fontSize=9, textColor=sidebar_text, spaceAfter=2, leftIndent=8)
 
-    class NameJobFrame(Flowable):
-        def __init__(self, name_text, job_text, name_style, job_style, border_color, bg_color, padding=15):
-            Flowable.__init__(self)
-            self.name_text = name_text
-            self.job_text = job_text
-            self.name_style = name_style
-            self.job_style = job_style
-            self.border_color = border_color
-            self.bg_color = bg_color
-            self.padding = padding
-            self.line_width = 1.5
-            
-        def wrap(self, availWidth, availHeight):
-            self.name_p = Paragraph(self.name_text, self.name_style)
-            self.job_p = Paragraph(self.job_text, self.job_style)
-            
-            w_name, h_name = self.name_p.wrap(availWidth, availHeight)
-            w_job, h_job = self.job_p.wrap(availWidth, availHeight)
-            
-            self.box_height = h_name + 2 * self.padding
-            self.job_height = h_job
-            
-            self.width = w_job + -40
+    return {
+        'sidebar_bg': sidebar_bg,
+        'sidebar_text': sidebar_text,
+        'header_border': header_border,
+        'header_bg_transparent': header_bg_transparent,
+        'name_style': name_style,
+        'job_subtitle_style': job_subtitle_style,
+        'sidebar_section_style': sidebar_section_style,
+        'sidebar_label': sidebar_label,
+        'sidebar_value': sidebar_value,
+        'sidebar_bullet': sidebar_bullet,
+        'main_section_style': main_section_style,
+        'profile_text': profile_text,
+        'date_style': date_style,
+        'position_style': position_style,
+        'company_style': company_style,
+        'bullet_style': bullet_style,
+        'edu_degree': edu_degree,
+        'edu_detail': edu_detail,
+    }
 
-            self.height = self.box_height + (h_job / 2)
-            return self.width, self.height
+# Built on first use per scheme instead of on every create_pdf call
+@functools.lru_cache(maxsize=None)
+def get_pdf_theme(scheme_name):
+    return build_pdf_theme(COLOR_SCHEMES_BY_NAME[scheme_name])
 
-        def draw(self):
-            box_bottom = self.job_height / 2
-            box_top = box_bottom + self.box_height
-            
-            self.canv.saveState()
-            self.canv.setFillColor(self.bg_color)
-            self.canv.rect(0, box_bottom, self.width, self.box_height, stroke=0, fill=0)
-            
-            self.name_p.wrap(self.width - 2*self.padding, self.box_height)
-            
-            self.name_p.drawOn(self.canv, self.padding, box_bottom + self.padding)
-            
-            if self.job_text:
-                self.job_p.wrap(self.width, self.job_height)
-                
-                self.job_p.drawOn(self.canv, 0, 0)
-                
-                job_width = stringWidth(self.job_text, self.job_style.fontName, self.job_style.fontSize)
-                gap_w = job_width + 20 
-            else:
-                gap_w = 0
+# Scheme and www. prefix dropped from links shown in the sidebar
+URL_PREFIX_RE = re.compile(r'^(?:https?://)?(?:www\.)?')
 
-            self.canv.setStrokeColor(self.border_color)
-            self.canv.setLineWidth(self.line_width)
-            
-            self.canv.line(0, box_top, self.width, box_top)
-            self.canv.line(0, box_bottom, 0, box_top)
-            self.canv.line(self.width, box_bottom, self.width, box_top)
-            
-            if gap_w > 0:
-                mid_x = self.width / 2
-                gap_start = mid_x - (gap_w / 2)
-                gap_end = mid_x + (gap_w / 2)
-                
-                self.canv.line(0, box_bottom, gap_start, box_bottom)
-                self.canv.line(gap_end, box_bottom, self.width, box_bottom)
-            else:
-                self.canv.line(0, box_bottom, self.width, box_bottom)
-                
-            self.canv.restoreState()
+def pick_color_scheme(data):
+    """The same CV content always gets the same scheme, so rebuilding a cached CV reproduces its PDF"""
+    digest = hashlib.blake2b(json_dumps(data).encode('utf-8'), digest_size=1).digest()
+    return COLOR_SCHEMES[digest[0] % len(COLOR_SCHEMES)]
+
+def create_pdf(data, filename):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    from reportlab.pdfgen import canvas
+    from reportlab.platypus import Paragraph, Spacer, Table, TableStyle
+    from reportlab.platypus.doctemplate import LayoutError
+
+    color_scheme = pick_color_scheme(data)
+    logger.info("Using color scheme: %s", color_scheme['name'])
+    
+    filepath = os.path.join(app.config['GENERATED_FOLDER'], filename)
+    
+    name = data.get('full_name', 'Your Name')
+    job_title = data.get('job_title', '')
+    email = data.get('email')
+    location = data.get('location')
+    links = data.get('links') or []
+    skills = data.get('skills') or []
+    education = data.get('education') or []
+    achievements = [a for a in data.get('achievements') or [] if a]
+    summary = data.get('summary')
+    experience = data.get('experience') or []
+    projects = [p for p in data.get('projects') or [] if p.get('title')]
+    
+    page_width, page_height = A4
+    sidebar_width = 180 
+    main_width = page_width - sidebar_width
+    
+    theme = get_pdf_theme(color_scheme['name'])
+    sidebar_bg = theme['sidebar_bg']
+    sidebar_text = theme['sidebar_text']
+    header_border = theme['header_border']
+    header_bg_transparent = theme['header_bg_transparent']
+    
+    name_style = theme['name_style']
+    job_subtitle_style = theme['job_subtitle_style']
+    sidebar_section_style = theme['sidebar_section_style']
+    sidebar_label = theme['sidebar_label']
+    sidebar_value = theme['sidebar_value']
+    sidebar_bullet = theme['sidebar_bullet']
+    main_section_style = theme['main_section_style']
+    profile_text = theme['profile_text']
+    date_style = theme['date_style']
+    position_style = theme['position_style']
+    company_style = theme['company_style']
+    bullet_style = theme['bullet_style']
+    edu_degree = theme['edu_degree']
+    edu_detail = theme['edu_detail']
 
     def make_boxed_header(text, style, border_color, bg_color=None, fit_width=False):
         para = Paragraph(text, style)
@@ -476,41 +906,38 @@ def create_pdf(data, filename):
         header_table.setStyle(TableStyle(table_style))
         return header_table
 
-    sidebar_elements = []
-    sidebar_elements.append(Spacer(1, 15))
+    sidebar_elements = [
+        Spacer(1, 15),
+        make_boxed_header("Profile", sidebar_section_style, sidebar_text, fit_width=True),
+        Spacer(1, 8),
+    ]
     
-    sidebar_elements.append(make_boxed_header("Profile", sidebar_section_style, sidebar_text, fit_width=True))
-    sidebar_elements.append(Spacer(1, 8))
+    if email:
+        sidebar_elements.extend((Paragraph("✉ Email", sidebar_label), Paragraph(email, sidebar_value)))
     
-    if data.get('email'):
-        sidebar_elements.append(Paragraph("✉ Email", sidebar_label))
-        sidebar_elements.append(Paragraph(data.get('email', ''), sidebar_value))
+    if location:
+        sidebar_elements.extend((Paragraph("☛ Location", sidebar_label), Paragraph(location, sidebar_value)))
     
-    if data.get('location'):
-        sidebar_elements.append(Paragraph("☛ Location", sidebar_label))
-        sidebar_elements.append(Paragraph(data.get('location', ''), sidebar_value))
+    for link in links:
+        clean_url = URL_PREFIX_RE.sub('', link['url'], count=1)
+        sidebar_elements.extend((Paragraph(f"✎ {link.get('label', 'Link')}", sidebar_label), Paragraph(clean_url, sidebar_value)))
     
-    if data.get('links'):
-        for link in data.get('links', []):
-            clean_url = link['url'].replace('https://', '').replace('http://', '').replace('www.', '')
-            sidebar_elements.append(Paragraph(f"✎ {link.get('label', 'Link')}", sidebar_label))
-            sidebar_elements.append(Paragraph(clean_url, sidebar_value))
+    if skills:
+        sidebar_elements.extend((
+            Spacer(1, 12),
+            make_boxed_header("Skills", sidebar_section_style, sidebar_text, fit_width=True),
+            Spacer(1, 6),
+        ))
+        sidebar_elements.extend(Paragraph(f" {skill}", sidebar_bullet) for skill in skills if skill)
     
-    if data.get('skills'):
-        sidebar_elements.append(Spacer(1, 12))
-        sidebar_elements.append(make_boxed_header("Skills", sidebar_section_style, sidebar_text, fit_width=True))
-        sidebar_elements.append(Spacer(1, 6))
-        
-        for skill in data.get('skills', []):
-            if skill:
-                sidebar_elements.append(Paragraph(f" {skill}", sidebar_bullet))
-    
-    if data.get('education'):
-        sidebar_elements.append(Spacer(1, 12))
-        sidebar_elements.append(make_boxed_header("Education", sidebar_section_style, sidebar_text, fit_width=True))
-        sidebar_elements.append(Spacer(1, 6))
+    if education:
+        sidebar_elements.extend((
+            Spacer(1, 12),
+            make_boxed_header("Education", sidebar_section_style, sidebar_text, fit_width=True),
+            Spacer(1, 6),
+        ))
         
-        for edu in data.get('education', []):
+        for edu in education:
             degree = edu.get('degree', '')
             institution = edu.get('institution', '')
             dates = edu.get('dates', '')
@@ -526,90 +953,65 @@ def create_pdf(data, filename):
                 sidebar_elements.append(Paragraph(f"Grade: {grade}", edu_detail))
             sidebar_elements.append(Spacer(1, 5))
     
-    if data.get('achievements'):
-        achievements = [a for a in data.get('achievements', []) if a]
-        if achievements:
-            sidebar_elements.append(Spacer(1, 12))
-            sidebar_elements.append(make_boxed_header("Achievements", sidebar_section_style, sidebar_text, fit_width=True))
-            sidebar_elements.append(Spacer(1, 6))
-            
-            for ach in achievements:
-                sidebar_elements.append(Paragraph(f" {ach}", sidebar_bullet))
-
-    name = data.get('full_name', 'Your Name')
-    job_title = data.get('job_title', '')
-    
-    header_content = []
-    header_content.append(Spacer(1, 15))
-
-    name_job_box = NameJobFrame(name, job_title, name_style, job_subtitle_style, header_border, header_bg_transparent)
-    header_content.append(name_job_box)
-    
-    header_content.append(Spacer(1, 16))
+    if achievements:
+        sidebar_elements.extend((
+            Spacer(1, 12),
+            make_boxed_header("Achievements", sidebar_section_style, sidebar_text, fit_width=True),
+            Spacer(1, 6),
+        ))
+        sidebar_elements.extend(Paragraph(f" {ach}", sidebar_bullet) for ach in achievements)
+
+    # The name box is drawn straight onto the canvas once the layout is placed; its table row only
+    # reserves the space. The job title sits across the box's bottom edge, which is left open behind it
+    name_p = Paragraph(name, name_style)
+    job_p = Paragraph(job_title, job_subtitle_style)
+    _, name_height = name_p.wrap(main_width, page_height)
+    _, job_height = job_p.wrap(main_width, page_height)
+    box_padding = 15
+    box_width = main_width - 40
+    box_height = name_height + 2 * box_padding
+    header_content = [Spacer(1, 15), Spacer(1, box_height + job_height / 2), Spacer(1, 16)]
     
-    header_inner = [[elem] for elem in header_content]
-    header_table = Table(header_inner, colWidths=[main_width])
-    header_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), header_bg_transparent),
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-        ('TOPPADDING', (0, 0), (-1, -1), 0),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
-    ]))
-    
-    body_elements = []
-    body_elements.append(Spacer(1, 16))
+    body_elements = [Spacer(1, 16)]
 
-    if data.get('summary'):
-        body_elements.append(Paragraph(data.get('summary', ''), profile_text))
-        body_elements.append(Spacer(1, 12))
+    if summary:
+        body_elements.extend((Paragraph(summary, profile_text), Spacer(1, 12)))
     
-    if data.get('experience'):
-        body_elements.append(make_boxed_header("Professional experience", main_section_style, header_border))
-        body_elements.append(Spacer(1, 10))
-        for job in data.get('experience', []):
+    if experience:
+        body_elements.extend((make_boxed_header("Professional experience", main_section_style, header_border), Spacer(1, 10)))
+        for job in experience:
             dates = job.get('dates', '')
             role = job.get('role', '')
             company = job.get('company', '')
             if dates: body_elements.append(Paragraph(dates, date_style))
             if role: body_elements.append(Paragraph(role, position_style))
             if company: body_elements.append(Paragraph(company, company_style))
-            for bullet in job.get('bullets', []): body_elements.append(Paragraph(f"- {bullet}", bullet_style))
+            body_elements.extend(Paragraph(f"- {bullet}", bullet_style) for bullet in job.get('bullets', []))
             body_elements.append(Spacer(1, 10))
             
-    if data.get('projects'):
-        projects = [p for p in data.get('projects', []) if p.get('title')]
-        if projects:
-            body_elements.append(Spacer(1, 8))
-            body_elements.append(make_boxed_header("Projects", main_section_style, header_border))
+    if projects:
+        body_elements.extend((Spacer(1, 8), make_boxed_header("Projects", main_section_style, header_border), Spacer(1, 10)))
+        for proj in projects:
+            title = proj.get('title', '')
+            tech = proj.get('tech', '')
+            if title: body_elements.append(Paragraph(title, position_style))
+            if tech: body_elements.append(Paragraph(tech, company_style))
+            body_elements.extend(Paragraph(f"• {bullet}", bullet_style) for bullet in proj.get('bullets', []))
             body_elements.append(Spacer(1, 10))
-            for proj in projects:
-                title = proj.get('title', '')
-                tech = proj.get('tech', '')
-                if title: body_elements.append(Paragraph(title, position_style))
-                if tech: body_elements.append(Paragraph(tech, company_style))
-                for bullet in proj.get('bullets', []): body_elements.append(Paragraph(f"• {bullet}", bullet_style))
-                body_elements.append(Spacer(1, 10))
-
-    body_inner = [[elem] for elem in body_elements]
-    body_table = Table(body_inner, colWidths=[main_width])
-    body_table.setStyle(TableStyle([
-        ('LEFTPADDING', (0, 0), (-1, -1), 20),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 20),
-        ('TOPPADDING', (0, 0), (-1, -1), 0), 
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-    ]))
 
-    main_stack = Table([[header_table], [body_table]], colWidths=[main_width])
-    main_stack.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, 0), header_bg_transparent),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0), 
-        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-        ('TOPPADDING', (0, 0), (-1, -1), 0), 
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
+    # Header band and body share one single-column table, one row per flowable
+    header_end = len(header_content) - 1
+    main_table = Table([[elem] for elem in header_content + body_elements], colWidths=[main_width])
+    main_table.setStyle(TableStyle([
         ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('TOPPADDING', (0, 0), (-1, -1), 0),
+        ('BACKGROUND', (0, 0), (-1, header_end), header_bg_transparent),
+        ('ALIGN', (0, 0), (-1, header_end), 'CENTER'),
+        ('LEFTPADDING', (0, 0), (-1, header_end), 0),
+        ('RIGHTPADDING', (0, 0), (-1, header_end), 0),
+        ('BOTTOMPADDING', (0, 0), (-1, header_end), 0),
+        ('LEFTPADDING', (0, header_end + 1), (-1, -1), 20),
+        ('RIGHTPADDING', (0, header_end + 1), (-1, -1), 20),
     ]))
 
     sidebar_inner = [[elem] for elem in sidebar_elements]
@@ -621,26 +1023,68 @@ def create_pdf(data, filename):
         ('TOPPADDING', (0, 0), (-1, -1), 0),
     ]))
     
-    layout_data = [[sidebar_table, main_stack]]
-    layout_table = Table(layout_data, colWidths=[sidebar_width, main_width])
-    layout_table.setStyle(TableStyle([
-        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 0),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 0),
-        ('TOPPADDING', (0, 0), (-1, -1), 0),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 0),
-    ]))
+    # The CV is one page with two top-aligned columns, so each column is drawn straight onto the
+    # canvas without a document template, frame or outer layout table; render into memory and write the file in one call
+    buffer = io.BytesIO()
+    pdf_canvas = canvas.Canvas(buffer, pagesize=A4)
+    pdf_canvas.saveState()
+    pdf_canvas.setFillColor(sidebar_bg)
+    pdf_canvas.rect(0, 0, sidebar_width, page_height, stroke=0, fill=1)
+    pdf_canvas.restoreState()
     
-    story = [layout_table]
-    doc.build(story)
-    return filename
-
+    _, sidebar_height = sidebar_table.wrapOn(pdf_canvas, sidebar_width, page_height)
+    _, main_height = main_table.wrapOn(pdf_canvas, main_width, page_height)
+    layout_height = max(sidebar_height, main_height)
+    if layout_height > page_height:
+        raise LayoutError(f"CV content is {layout_height:.0f}pt tall but the page is only {page_height:.0f}pt")
+    sidebar_table.drawOn(pdf_canvas, 0, page_height - sidebar_height)
+    main_table.drawOn(pdf_canvas, sidebar_width, page_height - main_height)
+
+    box_left = sidebar_width + (main_width - box_width) / 2
+    box_top = page_height - 15
+    box_bottom = box_top - box_height
+    box_right = box_left + box_width
+    pdf_canvas.saveState()
+    name_p.wrap(box_width - 2 * box_padding, box_height)
+    name_p.drawOn(pdf_canvas, box_left + box_padding, box_bottom + box_padding)
+    pdf_canvas.setStrokeColor(header_border)
+    pdf_canvas.setLineWidth(1.5)
+    pdf_canvas.line(box_left, box_top, box_right, box_top)
+    pdf_canvas.line(box_left, box_bottom, box_left, box_top)
+    pdf_canvas.line(box_right, box_bottom, box_right, box_top)
+    if job_title:
+        job_p.wrap(box_width, job_height)
+        job_p.drawOn(pdf_canvas, box_left, box_bottom - job_height / 2)
+        gap_w = stringWidth(job_title, job_subtitle_style.fontName, job_subtitle_style.fontSize) + 20
+        mid_x = box_left + box_width / 2
+        pdf_canvas.line(box_left, box_bottom, mid_x - gap_w / 2, box_bottom)
+        pdf_canvas.line(mid_x + gap_w / 2, box_bottom, box_right, box_bottom)
+    else:
+        pdf_canvas.line(box_left, box_bottom, box_right, box_bottom)
+    pdf_canvas.restoreState()
+    pdf_canvas.showPage()
+    pdf_canvas.save()
+    # Still written to disk so a download that lands on another worker can find it
+    with open(filepath, 'wb') as f:
+        f.write(buffer.getbuffer())
+    return buffer.getvalue()
+
+def render_pdf(data, filename):
+    """create_pdf on the process pool, since reportlab's layout holds the GIL for the whole render"""
+    # A single core gains nothing from the pool but still pays the IPC cost
+    if PDF_POOL_WORKERS < 2:
+        return create_pdf(data, filename)
+    return get_pdf_pool().submit(create_pdf, data, filename).result()
+
+
+# Commas, semicolons and newlines all separate list items; str.translate maps them in one C pass
+LIST_DELIMITERS = str.maketrans({',': '\n', ';': '\n'})
 
 def parse_list_field(raw_value):
     if not raw_value:
         return []
-    parts = re.split(r'[,;\n]+', raw_value)
-    return [p.strip() for p in parts if p.strip()]
+    parts = (p.strip() for p in raw_value.translate(LIST_DELIMITERS).split('\n'))
+    return [p for p in parts if p]
 
 def parse_voice_bank(form):
     return {
@@ -651,17 +1095,10 @@ def parse_voice_bank(form):
         'humour_allowed': form.get('humour_allowed', 'false').strip().lower() in {'true', '1', 'yes', 'on'}
     }
 
-def build_prompt(cv_text, job_desc, job_link, cadence, voice_bank):
-    cadence_desc = CADENCE_PRESETS[cadence]['description']
-    
-    voice_context = ""
-    if voice_bank.get('aside'):
-        voice_context = f"\nCandidate background: {voice_bank['aside']}"
-
-    return f"""You are a human CV writer. Write like a person, not an AI.
-
-JOB: {job_desc}
-{voice_context}
+# Static instructions shared by every request. Keeping them as one constant
+# prefix (with the per-request job, voice and CV after it) avoids rebuilding a
+# multi-KB string per call and lets Gemini reuse its prompt cache.
+PROMPT_PREFIX = """You are a human CV writer. Write like a person, not an AI.
 
 ## STEP 1: UNDERSTAND WHY AI TEXT GETS DETECTED
 
@@ -718,49 +1155,171 @@ EXPERIENCE BULLETS (tell mini-stories, vary length):
 
 
 
-## INPUT CV:
-{cv_text}
+"""
 
-## OUTPUT (JSON only, no explanation):
-{{
-    "full_name": "string",
-    "email": "string",
-    "location": "string", 
-    "links": [{{"label": "string", "url": "string"}}],
-    "summary": "First person. 3-4 sentences. Contractions. sounds professional but not robotic",
-    "achievements": ["string"],
-    "projects": [{{"title": "string", "tech": "string", "bullets": ["varied length human sentences"]}}],
-    "experience": [{{"role": "string", "company": "string", "dates": "string", "bullets": ["MUST vary in length and structure"]}}],
-    "education": [{{"degree": "string", "institution": "string", "dates": "string", "grade": "string", "modules": ["string"]}}],
-    "skills": ["string"]
+# The JSON shape itself comes from the response schema (CVOutput); only the
+# writing guidance per field is spelled out here
+PROMPT_SUFFIX = """## OUTPUT:
+- summary: first person, 3-4 sentences, contractions. Sounds professional but not robotic
+- experience and project bullets: MUST vary in length and structure, human sentences
+- IMPORTANT: if any information is missing from the CV leave that field blank
+"""
 
-    IMPORTANT: if any information is missing from this list leave the space blank 
-}}"""
+# Prompt size (and so prefill time and cost) grows with the CV, so very long
+# uploads keep their opening and closing sections only
+MAX_CV_CHARS = 15000
+CV_HEAD_CHARS = 12000
+CV_TAIL_CHARS = 3000
 
-def generate_cv_json(cv_text, job_desc, job_link, cadence='medium', voice_bank=None):
-    voice_bank = voice_bank or {}
-    prompt = build_prompt(cv_text, job_desc, job_link, cadence, voice_bank)
-    generation_config = get_generation_config(cadence)
-    
-    for model_name in VALID_MODELS:
-        logger.info(f"Trying model: {model_name}...")
+def truncate_cv_text(cv_text):
+    if len(cv_text) <= MAX_CV_CHARS:
+        return cv_text
+    return cv_text[:CV_HEAD_CHARS] + "\n...\n" + cv_text[-CV_TAIL_CHARS:]
+
+def build_prompt(cv_text, job_desc, job_link, cadence, voice_bank):
+    cv_text = truncate_cv_text(cv_text)
+    voice_context = ""
+    if voice_bank.get('aside'):
+        voice_context = f"\nCandidate background: {voice_bank['aside']}"
+
+    return "".join([
+        PROMPT_PREFIX,
+        "JOB: ", job_desc, "\n", voice_context, "\n\n",
+        "## INPUT CV:\n", cv_text, "\n\n",
+        PROMPT_SUFFIX
+    ])
+
+def normalize_for_key(text):
+    # Re-pasted job descriptions and re-exported CVs often differ only in whitespace
+    return " ".join((text or '').split())
+
+def cv_cache_key(cv_text, job_desc, cadence, voice_bank):
+    voice_key = json.dumps(voice_bank, sort_keys=True)
+    return (
+        f"analysis:{blake2b_hex(normalize_for_key(cv_text))}:{blake2b_hex(normalize_for_key(job_desc))}"
+        f":{cadence}:{blake2b_hex(voice_key)}"
+    )
+
+# Generations in progress by cache key; identical requests arriving meanwhile wait on the
+# leader's Future instead of streaming their own copy
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+# A single long-lived event loop drives Gemini's async client; its gRPC
+# channel is bound to the loop that created it, so every call must use this one
+_async_loop = None
+_async_loop_lock = threading.Lock()
+
+def get_async_loop():
+    global _async_loop
+    with _async_loop_lock:
+        if _async_loop is None:
+            _async_loop = asyncio.new_event_loop()
+            threading.Thread(target=_async_loop.run_forever, name='gemini-async', daemon=True).start()
+        return _async_loop
+
+# A whole CV stream must finish within this; a stalled model is abandoned rather than holding a request thread
+GEMINI_TIMEOUT_SECONDS = 60
+
+# Caps outbound Gemini calls per process so a burst queues here instead of
+# tripping the account quota and sending every request down the waterfall
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', '8'))
+GEMINI_SEMAPHORE = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+
+def is_rate_limited(error):
+    return isinstance(error, google_exceptions.ResourceExhausted) or '429' in str(error)
+
+# Recent per-model health: EMA of the failure rate, plus a cooldown after a 429.
+# The failure rate halves every MODEL_STATS_HALF_LIFE seconds so a demoted model is retried eventually.
+MODEL_STATS_ALPHA = 0.2
+MODEL_STATS_HALF_LIFE = 300
+MODEL_UNHEALTHY_FAIL_RATE = 0.5
+MODEL_COOLDOWN_SECONDS = 60
+_model_stats = {}
+_model_stats_lock = threading.Lock()
+
+def record_model_result(model_name, ok, error=None):
+    with _model_stats_lock:
+        now = time.monotonic()
+        stats = _model_stats.setdefault(model_name, {'fail_rate': 0.0, 'updated': now, 'cooldown_until': 0.0})
+        fail_rate = decayed_fail_rate(stats, now)
+        stats['fail_rate'] = fail_rate + MODEL_STATS_ALPHA * ((0.0 if ok else 1.0) - fail_rate)
+        stats['updated'] = now
+        if error is not None and is_rate_limited(error):
+            stats['cooldown_until'] = now + MODEL_COOLDOWN_SECONDS
+
+def decayed_fail_rate(stats, now):
+    return stats['fail_rate'] * 0.5 ** ((now - stats['updated']) / MODEL_STATS_HALF_LIFE)
+
+def ranked_models():
+    """
+    The model list reordered by recent health: cooling-down models go last and
+    mostly-failing ones next, otherwise the cost-based priority order is kept
+    """
+    now = time.monotonic()
+    with _model_stats_lock:
+        def health(item):
+            index, name = item
+            stats = _model_stats.get(name)
+            if stats is None:
+                return (False, False, index)
+            return (stats['cooldown_until'] > now, decayed_fail_rate(stats, now) >= MODEL_UNHEALTHY_FAIL_RATE, index)
+        return [name for _, name in sorted(enumerate(get_valid_models()), key=health)]
+
+async def stream_model_async(model, contents, generation_config, chunks):
+    """Put each streamed text chunk on chunks (a queue.Queue) as it arrives"""
+    async with GEMINI_SEMAPHORE:
         try:
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content(prompt, generation_config=generation_config)
-            
-            clean_text = response.text.replace('```json', '').replace('```', '')
-            logger.info(f"SUCCESS! Generated with: {model_name}")
-            cv_data = json.loads(clean_text)
-            cv_data = clean_cv_data(cv_data)
-            return cv_data
-            
+            await asyncio.wait_for(pump_stream_async(model, contents, generation_config, chunks), GEMINI_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"no complete response within {GEMINI_TIMEOUT_SECONDS}s") from None
+
+class OutputTruncatedError(RuntimeError):
+    """The model stopped at max_output_tokens, so the streamed JSON is incomplete"""
+
+async def pump_stream_async(model, contents, generation_config, chunks):
+    response = await model.generate_content_async(contents, generation_config=generation_config, stream=True)
+    async for chunk in response:
+        candidate = chunk.candidates[0] if chunk.candidates else None
+        if candidate is not None and candidate.finish_reason == genai.protos.Candidate.FinishReason.MAX_TOKENS:
+            # The final chunk may carry no text at all when thinking used up the budget
+            if candidate.content.parts:
+                chunks.put(chunk.text)
+            raise OutputTruncatedError(f"response hit max_output_tokens ({generation_config.max_output_tokens})")
+        chunks.put(chunk.text)
+
+def stream_cv_json(prompt, generation_config):
+    """Yield response text chunks from the first model that starts streaming"""
+    for model_name in ranked_models():
+        logger.info("Streaming from model: %s...", model_name)
+        started = False
+        try:
+            model = get_model(model_name)
+            # The call runs on the shared event loop; this request thread just drains the queue
+            chunks = queue.Queue()
+            future = asyncio.run_coroutine_threadsafe(
+                stream_model_async(model, prompt, generation_config, chunks), get_async_loop()
+            )
+            future.add_done_callback(lambda _, chunks=chunks: chunks.put(None))
+            try:
+                while (text := chunks.get()) is not None:
+                    started = True
+                    yield text
+                future.result()
+            finally:
+                # A client that disconnects mid-stream stops the call and frees its semaphore slot
+                future.cancel()
+            record_model_result(model_name, True)
+            return
         except Exception as e:
-            logger.warning(f"Failed ({model_name}): {e}")
+            record_model_result(model_name, False, error=e)
+            # Once text has reached the client another model cannot take over mid-document
+            if started:
+                raise
+            logger.warning("Failed (%s): %s", model_name, e)
             logger.info("Skipping to next model...")
-            continue
 
-    logger.error("CRITICAL: All models failed.")
-    return None
+    raise RuntimeError("All models failed to stream a response")
 
 VAGUE_PHRASES = [
     "improved efficiency",
@@ -778,55 +1337,233 @@ VAGUE_PHRASES = [
 ]
 
 MONTH_TOKENS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
-
-def bullet_has_anchor(text, skills_lower):
+MONTH_NAMES = ["january", "february", "march", "april", "june", "july", "august", "september", "october", "november", "december"]
+# Whole words only, so "market" or "decided" no longer count as a date; longest first so
+# "september" is tried before "sep"
+MONTH_WORDS_PATTERN = r"\b(?:" + "|".join(sorted({*MONTH_TOKENS, *MONTH_NAMES, "sept"}, key=len, reverse=True)) + r")\b"
+
+# Figures and acronyms are checked over the original text, then month names and the CV's skills as one
+# alternation over the lowercased text (matching anywhere, like the substring tests they replace; a
+# single (?i:...) pattern over everything measured several times slower in re)
+VAGUE_RE = re.compile("|".join(map(re.escape, VAGUE_PHRASES)))
+VAGUE_ORDER = {phrase: i for i, phrase in enumerate(VAGUE_PHRASES)}
+FIGURE_RE = re.compile(r"[0-9%£$€]")
+# Two capitals in a row are rare in prose, so the plain run check rules out most bullets
+# before the word-boundary pattern has to run
+UPPER_PAIR_RE = re.compile(r"[A-Z]{2}")
+ACRONYM_RE = re.compile(r"\b[A-Z]{2,}\b")
+
+@functools.lru_cache(maxsize=256)
+def compile_anchor_words(skills_lower):
+    """Month names plus the CV's lowercased skills, so both are checked in one pass"""
+    return re.compile("|".join([MONTH_WORDS_PATTERN] + [re.escape(s) for s in skills_lower]))
+
+# Regenerated CVs and copy-pasted roles repeat bullets; anchor_words_re is cached per skill
+# set, so the same bullet against the same skills hits here
+@functools.lru_cache(maxsize=512)
+def bullet_has_anchor(text, lower, anchor_words_re):
+    """lower is text.lower(), passed in because the caller has already built it"""
     if not text:
         return False
-    if re.search(r"[0-9%£$€]", text):
-        return True
-    lower = text.lower()
-    if any(month in lower for month in MONTH_TOKENS):
+    if FIGURE_RE.search(text):
         return True
-    if any(skill in lower for skill in skills_lower if len(skill) > 2):
+    if UPPER_PAIR_RE.search(text) and ACRONYM_RE.search(text):
         return True
-    if re.search(r"\b[A-Z]{2,}\b", text):
-        return True
-    return False
+    return anchor_words_re.search(lower) is not None
 
 def generate_quality_report(cv_data):
     if not cv_data:
         return []
-    skills_lower = [s.lower() for s in cv_data.get('skills', []) if isinstance(s, str)]
-    issues = []
+    # Every string bullet with where it came from, filtered once so the scan loop below has no type checks
+    bullets = [
+        (section, idx, bullet)
+        for section in ('experience', 'projects')
+        for idx, entry in enumerate(cv_data.get(section, []))
+        for bullet in entry.get('bullets') or []
+        if isinstance(bullet, str)
+    ]
+    if not bullets:
+        return []
 
-    def inspect_bullets(bullets, context):
-        for bullet in bullets or []:
-            if not isinstance(bullet, str):
-                continue
-            lower = bullet.lower()
-            for phrase in VAGUE_PHRASES:
-                if phrase in lower and not bullet_has_anchor(bullet, skills_lower):
-                    issues.append({
-                        "context": context,
-                        "bullet": bullet,
-                        "issue": f"Phrase '{phrase}' lacks a supporting metric, tool, or date."
-                    })
-                    break
+    # Skills shorter than three letters would match inside too many words to count as an anchor
+    skills_lower = tuple(dict.fromkeys(s.lower() for s in cv_data.get('skills', []) if isinstance(s, str) and len(s) > 2))
+    anchor_words_re = compile_anchor_words(skills_lower)
 
-    for idx, job in enumerate(cv_data.get('experience', [])):
-        inspect_bullets(job.get('bullets', []), f"experience[{idx}]")
-    for idx, project in enumerate(cv_data.get('projects', [])):
-        inspect_bullets(project.get('bullets', []), f"projects[{idx}]")
+    # One vague-phrase sweep over all bullets joined by NUL (which no phrase contains); each match
+    # maps back to its bullet through the bullets' start offsets
+    lowers = [bullet.lower() for _, _, bullet in bullets]
+    starts = list(itertools.accumulate((len(lower) + 1 for lower in lowers), initial=0))
+    found = {}
+    for match in VAGUE_RE.finditer("\x00".join(lowers)):
+        found.setdefault(bisect.bisect_right(starts, match.start()) - 1, set()).add(match.group())
+
+    issues = []
+    for i, phrases in found.items():
+        section, idx, bullet = bullets[i]
+        if not bullet_has_anchor(bullet, lowers[i], anchor_words_re):
+            # Report the phrase listed first in VAGUE_PHRASES, whatever its position in the bullet
+            phrase = min(phrases, key=VAGUE_ORDER.__getitem__)
+            issues.append({
+                "context": f"{section}[{idx}]",
+                "bullet": bullet,
+                "issue": f"Phrase '{phrase}' lacks a supporting metric, tool, or date."
+            })
 
     return issues
 
+# Analyses run on a small in-process pool so the request worker returns at once; clients poll /analyze/<job_id>,
+# which any worker can answer because job states are shared through Redis or GENERATED_FOLDER
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', '4'))
+ANALYSIS_JOB_TTL_SECONDS = 15 * 60
+_analysis_pool = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix='analysis')
+# Queued plus running jobs; past this /analyze answers 503 instead of growing the queue without bound
+ANALYSIS_MAX_PENDING = int(os.getenv('ANALYSIS_MAX_PENDING', str(ANALYSIS_WORKERS * 8)))
+_analysis_slots = threading.BoundedSemaphore(ANALYSIS_MAX_PENDING)
+_analysis_jobs = {}
+_analysis_jobs_lock = threading.Lock()
+# Security: job ids are secrets.token_hex(16)
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+def submit_analysis_job(fn, *args):
+    """
+    Queue fn(job_id, *args) and return the job id, or None when ANALYSIS_MAX_PENDING jobs are
+    already waiting; finished jobs are dropped after ANALYSIS_JOB_TTL_SECONDS
+    """
+    if not _analysis_slots.acquire(blocking=False):
+        return None
+    job_id = secrets.token_hex(16)
+    now = time.monotonic()
+    with _analysis_jobs_lock:
+        expired = [k for k, job in _analysis_jobs.items() if now - job['created'] > ANALYSIS_JOB_TTL_SECONDS]
+        for k in expired:
+            del _analysis_jobs[k]
+        job = _analysis_jobs[job_id] = {'status': 'queued', 'result': None, 'created': now}
+
+    def update(**fields):
+        job.update(fields)
+        # Other gunicorn workers may serve the poll, so every status change is shared with them
+        state = {'status': job['status'], 'result': job['result']}
+        if redis_client is not None:
+            redis_set_json(f"job:{job_id}", state, ttl=ANALYSIS_JOB_TTL_SECONDS)
+        else:
+            disk_set_json(job_disk_path(job_id), state, ANALYSIS_JOB_TTL_SECONDS)
+
+    def run():
+        update(status='running')
+        try:
+            result = fn(job_id, *args)
+            update(status='done', result=result)
+        except Exception as e:
+            # Security: Log the actual error server-side, keep the job result generic
+            logger.error("Analysis job %s failed: %s", job_id, e, exc_info=True)
+            update(status='failed', result={'error': 'An error occurred while processing your request. Please try again.'})
+        finally:
+            _analysis_slots.release()
+
+    update(status='queued')
+
+    _analysis_pool.submit(run)
+    return job_id
+
+def job_disk_path(job_id):
+    return os.path.join(JOB_DISK_DIR, f"{job_id}.json")
+
+def get_analysis_job(job_id):
+    with _analysis_jobs_lock:
+        job = _analysis_jobs.get(job_id)
+    if job is not None:
+        return {'status': job['status'], 'result': job['result']}
+    # Security: only ids shaped like ours reach Redis keys or file names
+    if not JOB_ID_PATTERN.match(job_id):
+        return None
+    if redis_client is not None:
+        return redis_get_json(f"job:{job_id}")
+    return disk_get_json(job_disk_path(job_id), ANALYSIS_JOB_TTL_SECONDS)
+
+# Dummy data for layout testing (as per original code); built once and only ever read
+MOCK_CV_DATA = {
+    "full_name": "Mia Smith",
+    "job_title": "Chief Executive Officer",
+    "email": "leonardofrazer@yahoo.co.uk",
+    "location": "Liverpool, UK",
+    "links": [
+        {"label": "Portfolio", "url": "editsbylennox.my.canva.site/vfx-portfolio"},
+    ],
+    "summary": "I'm a video editor who really enjoys making short, punchy content that grabs attention right away. I'm good at working with others to nail a creative vision.",
+    "skills": [
+        "Video Editing", "Graphic Design", "Creative Strategy", 
+        "Adobe Premiere Pro", "After Effects", "DaVinci Resolve"
+    ],
+    "experience": [
+        {
+            "role": "Video Editor (Freelance)",
+            "company": "Self-Employed",
+            "dates": "Jan 2022 - Present",
+            "bullets": [
+                "Worked closely with car dealerships to figure out exactly what their brand looked like.",
+                "Got raw footage looking top-notch using color grading.",
+                "Helped out with podcast videos for creators like Iman Ghazi."
+            ]
+        },
+        {
+            "role": "Junior Editor",
+            "company": "Creative Agency London",
+            "dates": "2020 - 2021",
+            "bullets": [
+                "Assisted senior editors with rough cuts and timeline management.",
+                "Organized terabytes of footage for quick access."
+            ]
+        }
+    ],
+    "education": [
+        {
+            "degree": "BSC Game Design",
+            "institution": "University of Liverpool",
+            "dates": "2023-2026",
+            "grade": "In Progress"
+        },
+        {
+            "degree": "Level 3 in Game Design",
+            "institution": "Carshalton College",
+            "dates": "2021-2023",
+            "grade": "Distinction"
+        }
+    ],
+    "achievements": [
+        "Duke Of Edinburgh Award - Bronze",
+        "Video Editing Competition - Sutra Edits"
+    ]
+}
+
+# Finished /analyze results by uploaded file name and content; users often upload the same CV again
+ANALYSIS_RESULT_CACHE = LRUCache(maxsize=256, ttl=CV_CACHE_TTL_SECONDS)
+
+def run_analysis(job_id, base_name, upload_digest):
+    """Build the CV PDF for an /analyze job, named by job id so concurrent uploads never collide"""
+    cache_key = f"{base_name}:{upload_digest}"
+    cached = ANALYSIS_RESULT_CACHE.get(cache_key)
+    # The earlier PDF is reused only while it can still be downloaded
+    if cached is not None and os.path.isfile(os.path.join(app.config['GENERATED_FOLDER'], cached['pdf_name'])):
+        logger.info("Cache hit: reusing the PDF and report for an identical upload")
+        return cached['result']
+
+    cv_data = MOCK_CV_DATA
+    pdf_name = f"{base_name}_CV_{job_id[:12]}.pdf"
+    PDF_CACHE.put(pdf_name, render_pdf(cv_data, pdf_name))
+    result = {
+        'pdf_url': f"/download/{pdf_name}",
+        'quality_report': generate_quality_report(cv_data)
+    }
+    ANALYSIS_RESULT_CACHE.put(cache_key, {'pdf_name': pdf_name, 'result': result})
+    return result
+
 @app.route('/')
 def index(): 
-    return render_template('landingpage.html')
+    return render_template('LandingPage.html')
 
 @app.route('/upload')
 def upload_cv(): 
-    return render_template('Cvupload.html')
+    return render_template('CVUpload.html')
 
 @app.route('/results')
 def results(): 
@@ -836,80 +1573,45 @@ def results():
 def subscriptions(): 
     return render_template('subscriptions.html')
 
+# Parse and compile the page templates at startup, so the first visitor to each page doesn't pay for it
+for template_name in ('LandingPage.html', 'CVUpload.html', 'results.html', 'subscriptions.html'):
+    app.jinja_env.get_template(template_name)
+
+def get_uploaded_cv():
+    """Security: Validate the uploaded CV, returning (file, ext, None) or (None, None, error response)"""
+    # Security: Validate file presence
+    if 'cv' not in request.files:
+        return None, None, (jsonify({'error': 'No file uploaded'}), 400)
+    
+    file = request.files['cv']
+    
+    # Security: Validate filename
+    if not file.filename:
+        return None, None, (jsonify({'error': 'No file selected'}), 400)
+    
+    # Security: Check file extension
+    if not allowed_file(file.filename):
+        return None, None, (jsonify({'error': 'Invalid file type. Only PDF and DOCX files are allowed.'}), 400)
+    ext = file_extension(file.filename)
+    
+    if upload_size(file) == 0:
+        return None, None, (jsonify({'error': 'Uploaded file is empty'}), 400)
+    
+    # Security: Reject mislabeled or corrupt files before any parser sees them
+    if not matches_signature(file, ext):
+        return None, None, (jsonify({'error': 'File content does not match its extension.'}), 400)
+    
+    return file, ext, None
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
     try:
-        # Security: Validate file presence
-        if 'cv' not in request.files:
-            return jsonify({'error': 'No file uploaded'}), 400
-        
-        file = request.files['cv']
-        
-        # Security: Validate filename
-        if not file.filename:
-            return jsonify({'error': 'No file selected'}), 400
-        
-        # Security: Check file extension
-        if not allowed_file(file.filename):
-            return jsonify({'error': 'Invalid file type. Only PDF and DOCX files are allowed.'}), 400
+        file, ext, error = get_uploaded_cv()
+        if error:
+            return error
         
         logger.info("Processing CV upload...")
 
-        # Dummy data for layout testing (as per original code)
-        cv_data = {
-            "full_name": "Mia Smith",
-            "job_title": "Chief Executive Officer",
-            "email": "leonardofrazer@yahoo.co.uk",
-            "location": "Liverpool, UK",
-            "links": [
-                {"label": "Portfolio", "url": "editsbylennox.my.canva.site/vfx-portfolio"},
-            ],
-            "summary": "I'm a video editor who really enjoys making short, punchy content that grabs attention right away. I'm good at working with others to nail a creative vision.",
-            "skills": [
-                "Video Editing", "Graphic Design", "Creative Strategy", 
-                "Adobe Premiere Pro", "After Effects", "DaVinci Resolve"
-            ],
-            "experience": [
-                {
-                    "role": "Video Editor (Freelance)",
-                    "company": "Self-Employed",
-                    "dates": "Jan 2022 - Present",
-                    "bullets": [
-                        "Worked closely with car dealerships to figure out exactly what their brand looked like.",
-                        "Got raw footage looking top-notch using color grading.",
-                        "Helped out with podcast videos for creators like Iman Ghazi."
-                    ]
-                },
-                {
-                    "role": "Junior Editor",
-                    "company": "Creative Agency London",
-                    "dates": "2020 - 2021",
-                    "bullets": [
-                        "Assisted senior editors with rough cuts and timeline management.",
-                        "Organized terabytes of footage for quick access."
-                    ]
-                }
-            ],
-            "education": [
-                {
-                    "degree": "BSC Game Design",
-                    "institution": "University of Liverpool",
-                    "dates": "2023-2026",
-                    "grade": "In Progress"
-                },
-                {
-                    "degree": "Level 3 in Game Design",
-                    "institution": "Carshalton College",
-                    "dates": "2021-2023",
-                    "grade": "Distinction"
-                }
-            ],
-            "achievements": [
-                "Duke Of Edinburgh Award - Bronze",
-                "Video Editing Competition - Sutra Edits"
-            ]
-        }
-
         # Security: Sanitize filename for PDF generation
         original_filename = secure_filename(file.filename)
         if not original_filename:
@@ -917,38 +1619,155 @@ def analyze():
             
         base_name = os.path.splitext(original_filename)[0]
         # Security: Ensure base_name is alphanumeric with underscores/hyphens only
-        base_name = re.sub(r'[^a-zA-Z0-9_\-]', '_', base_name)
-        pdf_name = f"{base_name}_CV.pdf"
+        base_name = UNSAFE_BASENAME_CHARS.sub('_', base_name)
 
-        # Create the PDF
-        create_pdf(cv_data, pdf_name)
-        generate_quality_report(cv_data)
-        
+        job_id = submit_analysis_job(run_analysis, base_name, upload_sha256(file))
+        if job_id is None:
+            logger.warning("Analysis queue is full; rejecting upload")
+            return jsonify({'error': 'The server is busy right now. Please try again in a moment.'}), 503, {'Retry-After': '5'}
         return jsonify({
             'success': True,
-            'pdf_url': f"/download/{pdf_name}",
-            'quality_report': []
-        })
+            'job_id': job_id,
+            'status_url': f"/status/{job_id}"
+        }), 202
 
+    except HTTPException:
+        # e.g. 413 from the upload limits, handled by the error handlers below
+        raise
     except Exception as e:
         # Security: Log the actual error server-side, return generic message to user
-        logger.error(f"Error in analyze endpoint: {e}", exc_info=True)
+        logger.error("Error in analyze endpoint: %s", e, exc_info=True)
         return jsonify({'error': 'An error occurred while processing your request. Please try again.'}), 500
 
 
+@app.route('/status/<job_id>')
+@app.route('/analyze/<job_id>')
+def analyze_status(job_id):
+    job = get_analysis_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/analyze_stream', methods=['POST'])
+def analyze_stream():
+    """Stream the generated CV JSON to the client as Server-Sent Events while Gemini writes it"""
+    file, ext, error = get_uploaded_cv()
+    if error:
+        return error
+    
+    cv_text = extract_cv_text(file.read(), ext)
+    if not cv_text.strip():
+        return jsonify({'error': 'Could not read any text from the uploaded CV.'}), 400
+    
+    job_desc = request.form.get('job_description', '').strip()
+    cadence = normalize_cadence(request.form.get('cadence'))
+    voice_bank = parse_voice_bank(request.form)
+    cache_key = cv_cache_key(cv_text, job_desc, cadence, voice_bank)
+    prompt = build_prompt(
+        cv_text,
+        job_desc,
+        request.form.get('job_link', '').strip(),
+        cadence,
+        voice_bank
+    )
+    generation_config = get_generation_config(cadence)
+
+    def events():
+        try:
+            # This worker's LRU first, then the copy shared between workers
+            cached = CV_JSON_CACHE.get(cache_key)
+            if cached is None:
+                cached = shared_get_json(cache_key)
+                if cached is not None:
+                    CV_JSON_CACHE.put(cache_key, cached)
+            if cached is not None:
+                logger.info("Cache hit: reusing generated CV for identical CV and job description")
+                yield f"data: {json_dumps({'cv': cached, 'done': True})}\n\n"
+                return
+            while True:
+                with _inflight_lock:
+                    future = _inflight.get(cache_key)
+                    leader = future is None
+                    if leader:
+                        future = _inflight[cache_key] = Future()
+                if leader:
+                    break
+                logger.info("Joining in-flight generation for identical CV and job description")
+                try:
+                    cv_data = future.result()
+                except CancelledError:
+                    # The leader's client went away before the CV was finished; take it over
+                    continue
+                yield f"data: {json_dumps({'cv': cv_data, 'done': True})}\n\n"
+                return
+
+            try:
+                # Chunks go out as they arrive; the assembled text is parsed once the model finishes
+                parts = []
+                for text in stream_cv_json(prompt, generation_config):
+                    parts.append(text)
+                    yield f"data: {json_dumps({'chunk': text})}\n\n"
+                cv_data = clean_cv_data(json_loads("".join(parts)))
+                CV_JSON_CACHE.put(cache_key, cv_data)
+                shared_set_json(cache_key, cv_data)
+                future.set_result(cv_data)
+            except Exception as e:
+                future.set_exception(e)
+                raise
+            finally:
+                with _inflight_lock:
+                    _inflight.pop(cache_key, None)
+                # No-op once a result or error is set; after a disconnect it hands the work to a waiter
+                future.cancel()
+            yield f"data: {json_dumps({'cv': cv_data, 'done': True})}\n\n"
+        except OutputTruncatedError as e:
+            logger.warning("CV generation cut off: %s", e)
+            yield f"data: {json_dumps({'error': 'The generated CV was too long and got cut off. Please try again.'})}\n\n"
+        except Exception as e:
+            # Security: Log the actual error server-side, return generic message to user
+            logger.error("Error in analyze_stream endpoint: %s", e, exc_info=True)
+            yield f"data: {json_dumps({'error': 'An error occurred while generating your CV. Please try again.'})}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @app.route('/download/<filename>')
 def download(filename):
     """
     Security: Secure file download endpoint with path traversal protection
     """
+    if not DOWNLOAD_ACCEL_PREFIX:
+        # Built by this worker: serve from memory, skipping path resolution and the disk entirely.
+        # Security: only names produced by secure_filename are looked up, as on the disk path
+        name = secure_filename(filename)
+        pdf_bytes = PDF_CACHE.get(name) if name else None
+        if pdf_bytes is not None:
+            response = send_file(io.BytesIO(pdf_bytes), mimetype='application/pdf', as_attachment=True, download_name=name, etag=blake2b_hex(pdf_bytes))
+            response.headers['Cache-Control'] = DOWNLOAD_CACHE_CONTROL
+            return response
+    
     # Security: Validate and sanitize the filename
     safe_path = validate_file_path(app.config['GENERATED_FOLDER'], filename)
     
     if safe_path is None:
-        logger.warning(f"Invalid download attempt for: {filename}")
+        logger.warning("Invalid download attempt for: %s", filename)
         abort(404)
     
-    return send_file(safe_path, as_attachment=True)
+    if DOWNLOAD_ACCEL_PREFIX:
+        # nginx streams the file itself; the worker only returns headers
+        response = Response(mimetype='application/pdf')
+        response.headers['X-Accel-Redirect'] = DOWNLOAD_ACCEL_PREFIX + os.path.basename(safe_path)
+        response.headers['Content-Disposition'] = f'attachment; filename="{os.path.basename(safe_path)}"'
+        response.headers['Cache-Control'] = DOWNLOAD_CACHE_CONTROL
+        return response
+    
+    response = send_file(safe_path, as_attachment=True)
+    response.headers['Cache-Control'] = DOWNLOAD_CACHE_CONTROL
+    return response
 
 
 # Security: Custom error handlers to prevent information leakage
@@ -958,12 +1777,16 @@ def not_found_error(error):
 
 @app.errorhandler(500)
 def internal_error(error):
-    logger.error(f"Internal server error: {error}")
+    logger.error("Internal server error: %s", error)
     return jsonify({'error': 'An internal error occurred'}), 500
 
 @app.errorhandler(413)
 def file_too_large(error):
-    return jsonify({'error': 'File too large. Maximum size is 16MB.'}), 413
+    # MAX_FORM_PARTS and MAX_FORM_MEMORY_SIZE also end in a 413, so only blame the file when the body is over the limit
+    content_length = request.content_length
+    if content_length is not None and content_length > app.config['MAX_CONTENT_LENGTH']:
+        return jsonify({'error': 'File too large. Maximum size is 16MB.'}), 413
+    return jsonify({'error': 'Request too large. Too many form fields, or a text field is too long.'}), 413
 
 
 if __name__ == '__main__':
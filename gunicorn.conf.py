@@ -0,0 +1,21 @@
+# Production server settings, picked up automatically by `gunicorn app:app`.
+# Requests spend most of their time waiting on Gemini, so each worker serves
+# many requests at once on a thread pool. The Gemini calls themselves run on
+# the app's own asyncio loop, so request threads only wait on futures.
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+# Analysis jobs are polled on whichever worker answers, so several workers are only
+# the default once REDIS_URL gives them a shared job store. Without it, a single
+# host can still set GUNICORN_WORKERS: they then share job state through generated/.
+default_workers = 2 * multiprocessing.cpu_count() + 1 if os.getenv('REDIS_URL') else 1
+workers = int(os.getenv('GUNICORN_WORKERS', str(default_workers)))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
+timeout = 120
+
+# Each worker imports app.py itself, so the Gemini client and its gRPC
+# channel are created per worker and never shared across a fork.
+preload_app = False
+
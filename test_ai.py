@@ -1,20 +1,32 @@
 import sys
 import subprocess
 import os
+import re
+from importlib.metadata import PackageNotFoundError, version
 from dotenv import load_dotenv
 
+# pip only runs when asked to; a plain run just reports what needs fixing
+INSTALL = '--install' in sys.argv[1:]
+
+def version_tuple(text):
+    # Compare numerically, so 0.10.0 counts as newer than 0.7.0
+    return tuple(int(part) for part in re.findall(r'\d+', text)[:3])
+
 print("------------------------------------------------------------")
 print(f"🔍 DIAGNOSTIC MODE using Python: {sys.executable}")
 print("------------------------------------------------------------")
 
 # 1. CHECK & UPDATE LIBRARY VERSION
+# The installed version is read from package metadata, without importing the library
 try:
-    import google.generativeai as genai
-    current_version = genai.__version__
+    current_version = version('google-generativeai')
     print(f"📉 Current Library Version: {current_version}")
     
     # We need at least version 0.7.0 for Gemini 1.5/2.0
-    if current_version < "0.7.0":
+    if version_tuple(current_version) < (0, 7, 0):
+        if not INSTALL:
+            print("⚠️  Library is TOO OLD. Run this script with --install to upgrade it.")
+            sys.exit(1)
         print("⚠️  Library is TOO OLD. Force updating now...")
         subprocess.check_call([sys.executable, '-m', 'pip', 'install', '--upgrade', 'google-generativeai'])
         print("✅ Update Complete. Please restart this script to test again.")
@@ -22,11 +34,16 @@ try:
     else:
         print("✅ Library Version is OK.")
         
-except ImportError:
+except PackageNotFoundError:
+    if not INSTALL:
+        print("❌ Library missing. Run this script with --install to install it.")
+        sys.exit(1)
     print("❌ Library missing. Installing now...")
     subprocess.check_call([sys.executable, '-m', 'pip', 'install', 'google-generativeai'])
     sys.exit()
 
+import google.generativeai as genai
+
 # 2. TEST API KEY & MODELS
 load_dotenv()
 key = os.getenv('GEMINI_API_KEY')